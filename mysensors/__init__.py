@@ -5,7 +5,6 @@ from distutils.version import LooseVersion as parse_ver
 from pathlib import Path
 
 import voluptuous as vol
-from voluptuous.humanize import humanize_error
 
 from .const import SYSTEM_CHILD_ID, get_const
 from .message import Message
@@ -56,7 +55,13 @@ class Gateway:
         try:
             msg.validate(self.protocol_version)
         except vol.Invalid as exc:
-            _LOGGER.warning("Invalid %s: %s", msg, humanize_error(msg.__dict__, exc))
+            if _LOGGER.isEnabledFor(logging.WARNING):
+                # pylint: disable=import-outside-toplevel
+                from voluptuous.humanize import humanize_error
+
+                _LOGGER.warning(
+                    "Invalid %s: %s", msg, humanize_error(msg.__dict__, exc)
+                )
             return None
 
         msg.gateway = self
@@ -175,7 +180,7 @@ class Gateway:
         A queued command will be sent to the sensor when the gateway
         thread has sent all previously queued commands.
 
-        If the sensor attribute new_state returns True, the command will be
+        If the sensor attribute is_smart_sleep_node is True, the command will be
         buffered in a queue on the sensor, and only the internal sensor state
         will be updated. When a smartsleep message is received, the internal
         state will be pushed to the sensor, via _handle_smartsleep method.
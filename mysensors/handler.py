@@ -22,13 +22,11 @@ def handle_smartsleep(msg):
         msg.gateway.tasks.add_job(str, job)
 
     for child in sensor.children.values():
-        new_child_state = sensor.new_state.get(child.id)
-
-        if not new_child_state:
+        if not child.desired_values:
             continue
 
         for value_type, _ in child.values.items():
-            new_value = new_child_state.values.get(value_type)
+            new_value = child.desired_values.get(value_type)
             if new_value is None:
                 continue
 
@@ -1,6 +1,9 @@
 """Handle sensor classes."""
+import copy
 import logging
-from collections import deque
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from functools import lru_cache
 
 import voluptuous as vol
 
@@ -10,12 +13,36 @@ from .validation import is_battery_level, is_heartbeat, safe_is_version
 
 _LOGGER = logging.getLogger(__name__)
 
+MODE_NORMAL = 0
+MODE_SMART_SLEEP = 1
+
+_SCHEMA_CACHE = {}
+VALIDATION_CACHE_SIZE = 64
+
+_get_const_cached = lru_cache(maxsize=8)(get_const)
+
 
 class Sensor:
     """Represent a sensor."""
 
     # pylint: disable=too-many-instance-attributes
 
+    __slots__ = (
+        "sensor_id",
+        "children",
+        "type",
+        "sketch_name",
+        "sketch_version",
+        "_battery_level",
+        "_protocol_version",
+        "_heartbeat",
+        "queue",
+        "reboot",
+        "mode",
+        "_validation_cache",
+        "_msg_type_set",
+    )
+
     def __init__(self, sensor_id):
         """Set up sensor."""
         self.sensor_id = sensor_id
@@ -26,33 +53,66 @@ class Sensor:
         self._battery_level = 0
         self._protocol_version = "1.4"
         self._heartbeat = 0
-        self.new_state = {}
         self.queue = deque()
         self.reboot = False
+        self.mode = MODE_NORMAL
+        self._validation_cache = OrderedDict()
+        self._msg_type_set = None
 
-    def __getstate__(self):
-        """Get state to save as pickle."""
-        state = self.__dict__.copy()
-        for attr in ("_battery_level", "_heartbeat", "_protocol_version"):
-            value = state.pop(attr, None)
-            prop = attr
-            if prop.startswith("_"):
-                prop = prop[1:]
-            if value is not None:
-                state[prop] = value
+    def __reduce_ex__(self, protocol):
+        """Return constructor and state tuple to save as pickle."""
+        return (
+            _rebuild_sensor,
+            (
+                type(self),
+                self.sensor_id,
+                self.children,
+                self.type,
+                self.sketch_name,
+                self.sketch_version,
+                self._battery_level,
+                self._protocol_version,
+                self._heartbeat,
+            ),
+        )
 
-        return state
+    def __deepcopy__(self, memo):
+        """Return a deep copy of the sensor."""
+        # pylint: disable=protected-access
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        new.sensor_id = self.sensor_id
+        new.children = {
+            child_id: copy.deepcopy(child, memo)
+            for child_id, child in self.children.items()
+        }
+        new.type = self.type
+        new.sketch_name = self.sketch_name
+        new.sketch_version = self.sketch_version
+        new._battery_level = self._battery_level
+        new._protocol_version = self._protocol_version
+        new._heartbeat = self._heartbeat
+        new.queue = deque(self.queue)
+        new.reboot = self.reboot
+        new.mode = self.mode
+        new._validation_cache = self._validation_cache.copy()
+        new._msg_type_set = self._msg_type_set
+        return new
 
     def __setstate__(self, state):
-        """Set state when loading pickle."""
+        """Set state when loading pickle saved with instance state dict."""
+        self._validation_cache = OrderedDict()
+        self._msg_type_set = None
         # Restore instance attributes
         for key, val in state.items():
+            if key == "new_state":
+                continue
             setattr(self, key, val)
         # Reset some attributes
-        self.new_state = {}
         self.queue = deque()
         self.reboot = False
-        if "_heartbeat" not in self.__dict__:
+        self.mode = MODE_NORMAL
+        if not hasattr(self, "_heartbeat"):
             self.heartbeat = 0
 
     def __repr__(self):
@@ -82,7 +142,22 @@ class Sensor:
     @property
     def is_smart_sleep_node(self):
         """Return True if the node uses smart sleep mode."""
-        return bool(self.new_state)
+        return self.mode == MODE_SMART_SLEEP
+
+    @property
+    def new_state(self):
+        """Return a read-only view of desired child states for smart sleep nodes."""
+        return _NewStateView(self.children)
+
+    @new_state.setter
+    def new_state(self, value):
+        """Replace desired child states with the values of child sensors."""
+        for child in self.children.values():
+            new_state_child = value.get(child.id)
+            child.desired_values = (
+                None if new_state_child is None else dict(new_state_child.values)
+            )
+        self.mode = MODE_SMART_SLEEP if value else MODE_NORMAL
 
     @property
     def protocol_version(self):
@@ -93,10 +168,13 @@ class Sensor:
     def protocol_version(self, value):
         """Set valid protocol version."""
         self._protocol_version = safe_is_version(value)
+        self._validation_cache.clear()
+        self._msg_type_set = None
 
     def add_child_sensor(self, child_id, child_type, description=""):
         """Create and add a child sensor."""
-        if child_id in self.children:
+        child = ChildSensor(child_id, child_type, description)
+        if self.children.setdefault(child_id, child) is not child:
             _LOGGER.warning(
                 "child_id %s already exists in children of node %s, "
                 "cannot add child",
@@ -104,77 +182,143 @@ class Sensor:
                 self.sensor_id,
             )
             return None
-        self.children[child_id] = ChildSensor(child_id, child_type, description)
         return child_id
 
     def get_desired_value(self, child_id, value_type):
         """Return sensor state value taking into account node type."""
-        if child_id not in self.children:
+        try:
+            child_id = int(child_id)
+            value_type = int(value_type)
+        except (ValueError, TypeError):
+            return None
+        child = self.children.get(child_id)
+        if child is None:
             return None
 
-        value = None
-
-        if self.is_smart_sleep_node:
-            child = self.new_state[child_id]
-            value = child.values.get(value_type) if child else None
-
-        if value:
-            return value
-
-        child = self.children[child_id]
+        desired_values = child.desired_values
+        if self.mode and desired_values is not None:
+            # A desired value of None means that no change is pending.
+            value = desired_values.get(value_type)
+            if value is not None:
+                return value
 
         return child.values.get(value_type)
 
     def init_smart_sleep_mode(self):
         """Init desired state dict for all known children."""
+        if not self.children:
+            return
+
         for child in self.children.values():
-            if child.id in self.new_state:
-                continue
+            if child.desired_values is None:
+                child.desired_values = {}
 
-            self.new_state[child.id] = ChildSensor(
-                child.id, child.type, child.description
-            )
+        self.mode = MODE_SMART_SLEEP
 
     def set_child_desired_state(self, child_id, value_type, value):
         """Set a desired child sensor's value for smart sleep nodes."""
-        if child_id not in self.new_state:
+        self.set_child_desired_states(child_id, {value_type: value})
+
+    def set_child_desired_states(self, child_id, values):
+        """Set desired child sensor's values for smart sleep nodes."""
+        try:
+            child = self.children.get(int(child_id))
+        except (ValueError, TypeError):
+            child = None
+        if child is None or child.desired_values is None:
             raise ValueError(
                 f"Child with id {child_id} not found for sensor {self.sensor_id}"
             )
 
-        self.validate_child_state(child_id, value_type, value)
+        values = self._validate_child_states(child.id, values)
 
-        child = self.new_state[child_id]
-        child.values[value_type] = value
+        child.desired_values.update(values)
 
     def update_child_value(self, child_id, value_type, value):
         """Update a child sensor's local state."""
-        if child_id not in self.children:
+        try:
+            child_id = int(child_id)
+            value_type = int(value_type)
+        except (ValueError, TypeError):
+            return
+        child = self.children.get(child_id)
+        if child is None:
             return
 
-        child = self.children[child_id]
         child.values[value_type] = value
 
-        if child_id not in self.new_state:
+        desired_values = child.desired_values
+        if desired_values is None:
             return
 
         # New state received from the node -
         # we can clear the desired state value to indicate that no changes are required
-        new_state_child = self.new_state[child_id]
-
-        new_state_child.values[value_type] = None
+        desired_values[value_type] = None
 
     def validate_child_state(self, child_id, value_type, value):
         """Check if we will be able to generate a set message from these values."""
-        const = get_const(self.protocol_version)
-        msg_type = const.MessageType.set
+        self._validate_child_states(child_id, {value_type: value})
 
+    def _validate_child_states(self, child_id, values):
+        """Validate child values and return them keyed by integer value type.
+
+        All values not already validated are checked in one schema call.
+        """
         try:
-            value_type = int(value_type)
+            child_id = int(child_id)
         except (ValueError, TypeError) as exc:
-            raise ValueError(f"Invalid value_type provided: {value_type}") from exc
+            raise ValueError(f"Invalid child_id provided: {child_id}") from exc
+
+        child = self.children.get(child_id)
+        # Values of unknown children are validated differently,
+        # so the child type is part of the cache key.
+        child_type = None if child is None else child.type
+        checked = {}
+        pending = {}
+        keys = []
+        for value_type, value in values.items():
+            try:
+                value_type = int(value_type)
+            except (ValueError, TypeError) as exc:
+                raise ValueError(f"Invalid value_type provided: {value_type}") from exc
+
+            checked[value_type] = value
+
+            try:
+                key = (child_id, child_type, value_type, type(value), value)
+                hash(key)
+            except TypeError:
+                key = (child_id, child_type, value_type, type(value), repr(value))
+            if key in self._validation_cache:
+                self._validation_cache.move_to_end(key)
+                continue
+
+            pending[value_type] = str(value)
+            keys.append(key)
+
+        if not pending:
+            return checked
+
+        if child is not None:
+            child.get_schema(self.protocol_version)(pending)
+        else:
+            # Unknown child, fall back to validating the full set messages.
+            for value_type, value in pending.items():
+                self._validate_set_message(child_id, value_type, value)
+
+        for key in keys:
+            self._validation_cache[key] = True
+            if len(self._validation_cache) > VALIDATION_CACHE_SIZE:
+                self._validation_cache.popitem(last=False)
+
+        return checked
 
-        value = str(value)
+    def _validate_set_message(self, child_id, value_type, value):
+        """Validate a set message built from these values."""
+        if self._msg_type_set is None:
+            const = _get_const_cached(self._protocol_version)
+            self._msg_type_set = const.MessageType.set
+        msg_type = self._msg_type_set
 
         msg = Message(
             node_id=self.sensor_id,
@@ -198,6 +342,8 @@ class Sensor:
 class ChildSensor:
     """Represent a child sensor."""
 
+    __slots__ = ("id", "type", "description", "values", "desired_values")
+
     def __init__(self, child_id, child_type, description=""):
         """Set up child sensor."""
         # pylint: disable=invalid-name
@@ -205,14 +351,38 @@ class ChildSensor:
         self.type = child_type
         self.description = description
         self.values = {}
+        self.desired_values = None
+
+    def __reduce_ex__(self, protocol):
+        """Return constructor and state tuple to save as pickle."""
+        return (
+            _rebuild_child_sensor,
+            (type(self), self.id, self.type, self.description, self.values),
+        )
+
+    def __deepcopy__(self, memo):
+        """Return a deep copy of the child sensor."""
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        new.id = self.id
+        new.type = self.type
+        new.description = self.description
+        new.values = self.values.copy()
+        new.desired_values = (
+            None if self.desired_values is None else self.desired_values.copy()
+        )
+        return new
 
     def __setstate__(self, state):
-        """Set state when loading pickle."""
+        """Set state when loading pickle saved with instance state dict."""
         # Restore instance attributes
-        self.__dict__.update(state)
+        for key, val in state.items():
+            setattr(self, key, val)
         # Make sure all attributes exist
-        if "description" not in self.__dict__:
+        if not hasattr(self, "description"):
             self.description = ""
+        self.values = {int(key): val for key, val in self.values.items()}
+        self.desired_values = None
 
     def __repr__(self):
         """Return the representation."""
@@ -223,19 +393,102 @@ class ChildSensor:
 
     def get_schema(self, protocol_version):
         """Return the child schema for the correct const version."""
-        const = get_const(protocol_version)
-        custom_schema = vol.Schema(
-            {
-                typ.value: const.VALID_SETREQ[typ]
-                for typ in const.VALID_TYPES[const.Presentation.S_CUSTOM]
-            }
-        )
-        return custom_schema.extend(
-            {typ.value: const.VALID_SETREQ[typ] for typ in const.VALID_TYPES[self.type]}
-        )
+        return _get_child_schemas(protocol_version)[self.type]
 
     def validate(self, protocol_version, values=None):
         """Validate child value types and values against protocol_version."""
         if values is None:
             values = self.values
         return self.get_schema(protocol_version)(values)
+
+
+class _NewStateView(Mapping):
+    """Represent desired child states of a sensor, keyed by child id.
+
+    The child sensors of the view share their values with the desired
+    values of the children of the sensor.
+    """
+
+    __slots__ = ("_children",)
+
+    def __init__(self, children):
+        """Set up view."""
+        self._children = children
+
+    def __getitem__(self, child_id):
+        """Return child sensor with the desired values of the child."""
+        child = self._children[child_id]
+        if child.desired_values is None:
+            raise KeyError(child_id)
+        new_state_child = ChildSensor(child.id, child.type, child.description)
+        new_state_child.values = child.desired_values
+        return new_state_child
+
+    def __iter__(self):
+        """Iterate over ids of children with desired values."""
+        return (
+            child_id
+            for child_id, child in self._children.items()
+            if child.desired_values is not None
+        )
+
+    def __len__(self):
+        """Return number of children with desired values."""
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        """Return the representation."""
+        return f"<NewState {dict(self)}>"
+
+
+def _get_child_schemas(protocol_version):
+    """Return child schemas by child type for the protocol_version."""
+    if protocol_version in _SCHEMA_CACHE:
+        return _SCHEMA_CACHE[protocol_version]
+    const = _get_const_cached(protocol_version)
+    valid_setreq = const.VALID_SETREQ
+    custom_schema = vol.Schema(
+        {
+            typ.value: valid_setreq[typ]
+            for typ in const.VALID_TYPES[const.Presentation.S_CUSTOM]
+        }
+    )
+    schemas = {
+        child_type: custom_schema.extend(
+            {typ.value: valid_setreq[typ] for typ in value_types}
+        )
+        for child_type, value_types in const.VALID_TYPES.items()
+    }
+    _SCHEMA_CACHE[protocol_version] = schemas
+    return schemas
+
+
+def _rebuild_sensor(
+    cls,
+    sensor_id,
+    children,
+    sensor_type,
+    sketch_name,
+    sketch_version,
+    battery_level,
+    protocol_version,
+    heartbeat,
+):
+    """Return a sensor loaded from pickle."""
+    # pylint: disable=protected-access, too-many-arguments
+    sensor = cls(sensor_id)
+    sensor.children = children
+    sensor.type = sensor_type
+    sensor.sketch_name = sketch_name
+    sensor.sketch_version = sketch_version
+    sensor._battery_level = battery_level
+    sensor._protocol_version = protocol_version
+    sensor._heartbeat = heartbeat
+    return sensor
+
+
+def _rebuild_child_sensor(cls, child_id, child_type, description, values):
+    """Return a child sensor loaded from pickle."""
+    child = cls(child_id, child_type, description)
+    child.values = values
+    return child
@@ -50,6 +50,22 @@ def test_logic_bad_message(gateway):
     assert gateway.logic("bad;bad;bad;bad;bad;bad\n") is None
 
 
+def test_logic_invalid_message(gateway, caplog):
+    """Test that an invalid message is logged in logic method."""
+    caplog.set_level(logging.WARNING)
+    assert gateway.logic("1;0;1;0;9999;50\n") is None
+    assert "Invalid <Message" in caplog.text
+
+
+@mock.patch("voluptuous.humanize.humanize_error")
+def test_logic_invalid_message_logging_disabled(mock_humanize, gateway, caplog):
+    """Test that an invalid message is not humanized when not logged."""
+    caplog.set_level(logging.ERROR)
+    assert gateway.logic("1;0;1;0;9999;50\n") is None
+    assert "Invalid <Message" not in caplog.text
+    assert mock_humanize.call_count == 0
+
+
 def test_per_instance_handler():
     """Test that gateway can add own handlers."""
     gateway_1 = get_gateway()
@@ -582,6 +598,35 @@ def test_node_mark_as_smartsleep(protocol_version, wake_msg):
     assert 0 in sensor.new_state
 
 
+@pytest.mark.parametrize(
+    "protocol_version, wake_msg",
+    [
+        ("2.0", "1;255;3;0;22;123456\n"),
+        ("2.1", "1;255;3;0;22;123456\n"),
+        ("2.2", "1;255;3;0;32;500\n"),
+    ],
+)
+def test_node_without_children_not_smartsleep(protocol_version, wake_msg):
+    """Test that a node without children is not marked as smartsleep."""
+    gateway = get_gateway(protocol_version=protocol_version)
+    sensor = get_sensor(1, gateway)
+
+    # heartbeat
+    gateway.logic(wake_msg)
+
+    assert not sensor.is_smart_sleep_node
+
+    # child presented after the heartbeat
+    sensor.add_child_sensor(0, gateway.const.Presentation.S_LIGHT_LEVEL)
+    gateway.set_child_value(
+        sensor.sensor_id, 0, gateway.const.SetReq.V_LIGHT_LEVEL, "65"
+    )
+
+    assert not sensor.queue
+    ret = gateway.tasks.run_job()
+    assert ret == "1;0;1;0;23;65\n"
+
+
 @pytest.mark.parametrize(
     "protocol_version, wake_msg",
     [
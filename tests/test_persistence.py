@@ -1,4 +1,5 @@
 """Test persistence."""
+import copyreg
 import json
 import os
 from collections import deque
@@ -142,27 +143,24 @@ def test_persistence_upgrade(mock_save_json, gateway, add_sensor, filename, tmpd
     mock_save_json.side_effect = save_json_upgrade
     sensor = add_sensor(1)
     sensor.add_child_sensor(0, gateway.const.Presentation.S_LIGHT_LEVEL)
-    del sensor.__dict__["new_state"]
-    assert "new_state" not in sensor.__dict__
-    del sensor.__dict__["queue"]
-    assert "queue" not in sensor.__dict__
-    del sensor.__dict__["reboot"]
-    assert "reboot" not in sensor.__dict__
-    del sensor.__dict__["_battery_level"]
-    assert "_battery_level" not in sensor.__dict__
-    sensor.__dict__["battery_level"] = 58
-    del sensor.__dict__["_protocol_version"]
-    assert "_protocol_version" not in sensor.__dict__
-    sensor.__dict__["protocol_version"] = gateway.protocol_version
-    del sensor.__dict__["_heartbeat"]
-    assert "_heartbeat" not in sensor.__dict__
-    del sensor.children[0].__dict__["description"]
-    assert "description" not in sensor.children[0].__dict__
+    del sensor.queue
+    assert not hasattr(sensor, "queue")
+    del sensor.reboot
+    assert not hasattr(sensor, "reboot")
+    sensor.battery_level = 58
+    sensor.protocol_version = gateway.protocol_version
+    del sensor._heartbeat  # pylint: disable=protected-access
+    assert not hasattr(sensor, "_heartbeat")
+    del sensor.children[0].description
+    assert not hasattr(sensor.children[0], "description")
     persistence_file = tmpdir.join(filename)
     gateway.persistence = Persistence(
         gateway.sensors, mock.MagicMock(), persistence_file.strpath
     )
-    gateway.persistence.save_sensors()
+    with mock.patch.object(Sensor, "__reduce_ex__", legacy_reduce), mock.patch.object(
+        ChildSensor, "__reduce_ex__", legacy_reduce
+    ):
+        gateway.persistence.save_sensors()
     del gateway.sensors[1]
     assert 1 not in gateway.sensors
     gateway.persistence.safe_load_sensors()
@@ -177,13 +175,48 @@ def test_persistence_upgrade(mock_save_json, gateway, add_sensor, filename, tmpd
     assert gateway.sensors[1].children[0].type == sensor.children[0].type
 
 
+LEGACY_ATTRS = {
+    Sensor: (
+        "sensor_id",
+        "children",
+        "type",
+        "sketch_name",
+        "sketch_version",
+        "_battery_level",
+        "_protocol_version",
+        "_heartbeat",
+        "queue",
+        "reboot",
+    ),
+    ChildSensor: ("id", "type", "description", "values"),
+}
+
+
+def legacy_state(obj):
+    """Return instance state in the format of older persistence files."""
+    state = {
+        attr: getattr(obj, attr)
+        for attr in LEGACY_ATTRS[type(obj)]
+        if hasattr(obj, attr)
+    }
+    for attr in ("_battery_level", "_heartbeat", "_protocol_version"):
+        if attr in state:
+            state[attr[1:]] = state.pop(attr)
+    return state
+
+
+def legacy_reduce(obj, protocol):  # pylint: disable=unused-argument
+    """Reduce object like older versions saved it to pickle."""
+    return copyreg.__newobj__, (type(obj),), legacy_state(obj)
+
+
 class MySensorsJSONEncoderTestUpgrade(MySensorsJSONEncoder):
     """JSON encoder used for testing upgrade with missing attributes."""
 
     def default(self, o):
         """Serialize obj into JSON."""
         if isinstance(o, Sensor):
-            return o.__dict__
+            return legacy_state(o)
         if isinstance(o, ChildSensor):
             return {
                 "id": o.id,
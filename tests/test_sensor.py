@@ -1,8 +1,12 @@
 """Test task module."""
+import copy
+import pickle
+from unittest import mock
+
 import pytest
 import voluptuous
 
-from mysensors.sensor import ChildSensor, Sensor
+from mysensors.sensor import MODE_NORMAL, MODE_SMART_SLEEP, ChildSensor, Sensor
 from mysensors.const import get_const
 
 
@@ -15,10 +19,12 @@ def test_is_smart_sleep_node():
     sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL)
 
     assert not sensor.is_smart_sleep_node
+    assert sensor.mode == MODE_NORMAL
 
-    sensor.new_state[sensor_id] = {}
+    sensor.init_smart_sleep_mode()
 
     assert sensor.is_smart_sleep_node
+    assert sensor.mode == MODE_SMART_SLEEP
 
 
 def test_init_smart_sleep_mode():
@@ -40,6 +46,51 @@ def test_init_smart_sleep_mode():
     assert isinstance(sensor.new_state[1], ChildSensor)
 
 
+def test_add_child_sensor():
+    """Test that an existing child sensor is not replaced."""
+    const = get_const("1.4")
+    sensor = Sensor(1)
+
+    assert sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL) == 0
+    child = sensor.children[0]
+
+    assert sensor.add_child_sensor(0, const.Presentation.S_HUM) is None
+    assert sensor.children[0] is child
+    assert child.type == const.Presentation.S_LIGHT_LEVEL
+
+
+def test_new_state():
+    """Test the new state view and replacing the new state."""
+    const = get_const("1.4")
+    value_type = const.SetReq.V_LIGHT_LEVEL
+    sensor = Sensor(1)
+    sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL)
+    sensor.add_child_sensor(1, const.Presentation.S_LIGHT_LEVEL)
+    sensor.init_smart_sleep_mode()
+
+    new_state = sensor.new_state
+    assert len(new_state) == 2
+    assert list(new_state) == [0, 1]
+
+    # values of the view are the desired values of the child
+    new_state[0].values[value_type] = "50"
+    assert sensor.get_desired_value(0, value_type) == "50"
+
+    with pytest.raises(TypeError):
+        new_state[0] = ChildSensor(0, const.Presentation.S_LIGHT_LEVEL)
+
+    new_state_child = ChildSensor(1, const.Presentation.S_LIGHT_LEVEL)
+    new_state_child.values[value_type] = "60"
+    sensor.new_state = {1: new_state_child}
+    assert list(sensor.new_state) == [1]
+    assert sensor.get_desired_value(1, value_type) == "60"
+    assert sensor.is_smart_sleep_node
+
+    sensor.new_state = {}
+    assert sensor.new_state == {}
+    assert not sensor.is_smart_sleep_node
+
+
 def test_get_desired_value():
     """Test that sensor returns correct desired value in different states."""
     const = get_const("1.4")
@@ -65,8 +116,14 @@ def test_get_desired_value():
     sensor.update_child_value(child_id, value_type, "70")
     assert sensor.get_desired_value(child_id, value_type) == "70"
 
+    # falsy desired values are returned
+    sensor.set_child_desired_state(child_id, value_type, 0)
+    assert sensor.get_desired_value(child_id, value_type) == 0
+
     assert sensor.get_desired_value(wrong_child_id, value_type) is None
     assert sensor.get_desired_value(child_id, wrong_value_type) is None
+    assert sensor.get_desired_value(None, value_type) is None
+    assert sensor.get_desired_value(child_id, "bad value type") is None
 
 
 def test_set_child_desired_state():
@@ -96,6 +153,12 @@ def test_set_child_desired_state():
     with pytest.raises(ValueError):
         sensor.set_child_desired_state(wrong_child_id, value_type, "50")
 
+    # does not set child ids that are not numbers
+    with pytest.raises(ValueError, match="not found"):
+        sensor.set_child_desired_state(None, value_type, "50")
+    with pytest.raises(ValueError, match="not found"):
+        sensor.set_child_desired_state("bad child id", value_type, "50")
+
     # does not set wrong value type
     with pytest.raises(voluptuous.error.MultipleInvalid):
         sensor.set_child_desired_state(child_id, wrong_value_type, "50")
@@ -105,6 +168,35 @@ def test_set_child_desired_state():
         sensor.set_child_desired_state(child_id, value_type, "bad value")
 
 
+def test_set_child_desired_states():
+    """Test that we are able to set multiple desired values at once."""
+    const = get_const("1.4")
+    sensor_id = 1
+    child_id = 0
+    light_type = const.SetReq.V_LIGHT
+    dimmer_type = const.SetReq.V_DIMMER
+
+    sensor = Sensor(sensor_id)
+    sensor.add_child_sensor(child_id, const.Presentation.S_DIMMER)
+    sensor.init_smart_sleep_mode()
+
+    sensor.set_child_desired_states(child_id, {light_type: "1", dimmer_type: "50"})
+    assert sensor.new_state[child_id].values[light_type] == "1"
+    assert sensor.new_state[child_id].values[dimmer_type] == "50"
+
+    # no values are set if one value is invalid
+    with pytest.raises(voluptuous.error.MultipleInvalid):
+        sensor.set_child_desired_states(
+            child_id, {light_type: "0", dimmer_type: "bad value"}
+        )
+    assert sensor.new_state[child_id].values[light_type] == "1"
+    assert sensor.new_state[child_id].values[dimmer_type] == "50"
+
+    # does not set wrong value type
+    with pytest.raises(ValueError):
+        sensor.set_child_desired_states(child_id, {"bad value type": "50"})
+
+
 def test_update_child_value():
     """Test that we can update child state."""
     const = get_const("1.4")
@@ -130,6 +222,30 @@ def test_update_child_value():
     sensor.update_child_value(wrong_child_id, value_type, "50")
     assert wrong_child_id not in sensor.children
 
+    # ignores ids that are not numbers
+    sensor.update_child_value(None, value_type, "50")
+    sensor.update_child_value(child_id, "bad value type", "50")
+    assert sensor.children[child_id].values == {value_type: "90"}
+
+
+def test_update_child_value_int_keys():
+    """Test that child values are stored with integer value types."""
+    const = get_const("1.4")
+    child_id = 0
+    value_type = const.SetReq.V_LIGHT_LEVEL
+
+    sensor = Sensor(1)
+    sensor.add_child_sensor(child_id, const.Presentation.S_LIGHT_LEVEL)
+    sensor.init_smart_sleep_mode()
+
+    sensor.update_child_value(child_id, value_type, "50")
+    sensor.set_child_desired_state(child_id, value_type, "60")
+
+    child = sensor.children[child_id]
+    assert [type(key) for key in child.values] == [int]
+    assert [type(key) for key in child.desired_values] == [int]
+    assert sensor.get_desired_value(child_id, str(int(value_type))) == "60"
+
 
 def test_update_child_value_resets_new_state():
     """Test that update of child state resets the new state."""
@@ -169,10 +285,196 @@ def test_validate_child_state():
     with pytest.raises(voluptuous.error.MultipleInvalid):
         sensor.validate_child_state(child_id, 9999, "50")
 
+    # value type not valid for the child type
+    with pytest.raises(voluptuous.error.MultipleInvalid):
+        sensor.validate_child_state(child_id, const.SetReq.V_TEMP, "20.0")
+
     with pytest.raises(ValueError):
         sensor.validate_child_state(child_id, "bad value type", "50")
 
     with pytest.raises(ValueError):
         sensor.validate_child_state(child_id, None, "50")
 
+    with pytest.raises(ValueError):
+        sensor.validate_child_state("bad child id", value_type, "50")
+
+    # child id is converted before looking up the child schema
+    with pytest.raises(voluptuous.error.MultipleInvalid):
+        sensor.validate_child_state(str(child_id), const.SetReq.V_TEMP, "20.0")
+
     sensor.validate_child_state(child_id, value_type, "50")
+
+
+def test_get_schema_cached():
+    """Test that the child schema is reused for the same version and type."""
+    const = get_const("1.4")
+    child = ChildSensor(0, const.Presentation.S_LIGHT_LEVEL)
+    other = ChildSensor(1, const.Presentation.S_LIGHT_LEVEL)
+
+    schema = child.get_schema("1.4")
+
+    assert other.get_schema("1.4") is schema
+    assert child.get_schema("1.5") is not schema
+
+
+def test_validate_child_state_cached():
+    """Test that a validated child state is cached on the sensor."""
+    const = get_const("1.4")
+    sensor_id = 1
+    child_id = 0
+    value_type = const.SetReq.V_LIGHT_LEVEL
+
+    sensor = Sensor(sensor_id)
+    sensor.add_child_sensor(child_id, const.Presentation.S_LIGHT_LEVEL)
+
+    with mock.patch.object(ChildSensor, "get_schema") as mock_get_schema:
+        sensor.validate_child_state(child_id, value_type, "50")
+        sensor.validate_child_state(child_id, value_type, "50")
+
+    assert mock_get_schema.call_count == 1
+
+    sensor.protocol_version = "1.5"
+
+    with mock.patch.object(ChildSensor, "get_schema") as mock_get_schema:
+        sensor.validate_child_state(child_id, value_type, "50")
+
+    assert mock_get_schema.call_count == 1
+
+
+def test_validate_child_state_cached_unknown_child():
+    """Test that validation of an unknown child is not reused for a new child."""
+    const = get_const("1.4")
+    child_id = 5
+    value_type = const.SetReq.V_TEMP
+
+    sensor = Sensor(1)
+    sensor.validate_child_state(child_id, value_type, "20")
+    sensor.add_child_sensor(child_id, const.Presentation.S_DOOR)
+    sensor.init_smart_sleep_mode()
+
+    with pytest.raises(voluptuous.error.MultipleInvalid):
+        sensor.set_child_desired_state(child_id, value_type, "20")
+
+
+def test_pickle_sensor():
+    """Test that a sensor and its children survive a pickle round trip."""
+    const = get_const("1.4")
+    sensor = Sensor(1)
+    sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL, "light")
+    sensor.update_child_value(0, const.SetReq.V_LIGHT_LEVEL, "50")
+    sensor.battery_level = 78
+    sensor.heartbeat = 10
+    sensor.protocol_version = "2.0"
+    sensor.init_smart_sleep_mode()
+    sensor.set_child_desired_state(0, const.SetReq.V_LIGHT_LEVEL, "90")
+    sensor.queue.append("1;0;1;0;23;50\n")
+    sensor.reboot = True
+
+    loaded = pickle.loads(pickle.dumps(sensor, pickle.HIGHEST_PROTOCOL))
+
+    assert not hasattr(loaded, "__dict__")
+    assert loaded.sensor_id == 1
+    assert loaded.battery_level == 78
+    assert loaded.heartbeat == 10
+    assert loaded.protocol_version == "2.0"
+    assert loaded.new_state == {}
+    assert not loaded.is_smart_sleep_node
+    assert not loaded.queue
+    assert loaded.reboot is False
+    child = loaded.children[0]
+    assert isinstance(child, ChildSensor)
+    assert child.type == const.Presentation.S_LIGHT_LEVEL
+    assert child.description == "light"
+    assert child.values == {const.SetReq.V_LIGHT_LEVEL: "50"}
+    assert child.desired_values is None
+
+
+class SubSensor(Sensor):
+    """Represent a sensor subclass."""
+
+    __slots__ = ()
+
+
+class SubChildSensor(ChildSensor):
+    """Represent a child sensor subclass."""
+
+    __slots__ = ()
+
+
+def test_pickle_sensor_subclass():
+    """Test that subclasses of sensor classes survive a pickle round trip."""
+    const = get_const("1.4")
+    sensor = SubSensor(1)
+    sensor.children[0] = SubChildSensor(0, const.Presentation.S_LIGHT_LEVEL)
+
+    loaded = pickle.loads(pickle.dumps(sensor, pickle.HIGHEST_PROTOCOL))
+
+    assert type(loaded) is SubSensor
+    assert type(loaded.children[0]) is SubChildSensor
+
+
+def test_setstate_with_new_state():
+    """Test loading pickle state that contains a new_state dict."""
+    const = get_const("1.4")
+    child = ChildSensor(0, const.Presentation.S_LIGHT_LEVEL)
+    sensor = Sensor.__new__(Sensor)
+
+    sensor.__setstate__(
+        {
+            "sensor_id": 1,
+            "children": {0: child},
+            "battery_level": 58,
+            "protocol_version": "1.4",
+            "new_state": {0: ChildSensor(0, const.Presentation.S_LIGHT_LEVEL)},
+        }
+    )
+
+    assert sensor.children == {0: child}
+    assert sensor.battery_level == 58
+    assert sensor.heartbeat == 0
+    assert sensor.new_state == {}
+    assert not sensor.is_smart_sleep_node
+
+
+def test_deepcopy_sensor():
+    """Test that a deep copy of a sensor does not share mutable state."""
+    const = get_const("1.4")
+    value_type = const.SetReq.V_LIGHT_LEVEL
+    sensor = Sensor(1)
+    sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL, "light")
+    sensor.update_child_value(0, value_type, "50")
+    sensor.battery_level = 78
+    sensor.protocol_version = "2.0"
+    sensor.init_smart_sleep_mode()
+    sensor.set_child_desired_state(0, value_type, "90")
+    sensor.queue.append("1;0;1;0;23;50\n")
+
+    sensor_copy = copy.deepcopy(sensor)
+
+    assert sensor_copy is not sensor
+    assert sensor_copy.battery_level == 78
+    assert sensor_copy.protocol_version == "2.0"
+    assert sensor_copy.is_smart_sleep_node
+    assert sensor_copy.queue == sensor.queue
+    assert sensor_copy.queue is not sensor.queue
+    child_copy = sensor_copy.children[0]
+    assert child_copy is not sensor.children[0]
+    assert child_copy.description == "light"
+    assert child_copy.values == {value_type: "50"}
+    assert sensor_copy.get_desired_value(0, value_type) == "90"
+
+    sensor_copy.update_child_value(0, value_type, "70")
+
+    assert sensor.children[0].values[value_type] == "50"
+    assert sensor.get_desired_value(0, value_type) == "90"
+
+
+def test_deepcopy_sensor_memo():
+    """Test that deep copy of a sensor shares copies through the memo."""
+    const = get_const("1.4")
+    sensor = Sensor(1)
+    sensor.add_child_sensor(0, const.Presentation.S_LIGHT_LEVEL)
+
+    child_copy, sensor_copy = copy.deepcopy([sensor.children[0], sensor])
+
+    assert child_copy is sensor_copy.children[0]